@@ -1,4 +1,27 @@
-from setuptools import setup
+import os
+from setuptools import setup, Extension
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    cythonize = None
+
+# Build the extension from the .pyx when Cython is available, otherwise from the
+# generated .c shipped in the sdist. Without either the package falls back to the
+# numba or NumPy kernels.
+if cythonize is not None and os.path.exists("stats_batch/_chan.pyx"):
+    ext_modules = cythonize([Extension("stats_batch._chan", ["stats_batch/_chan.pyx"],
+                                       extra_compile_args=["-O3"])])
+elif os.path.exists("stats_batch/_chan.c"):
+    ext_modules = [Extension("stats_batch._chan", ["stats_batch/_chan.c"],
+                             extra_compile_args=["-O3"])]
+else:
+    ext_modules = []
+
+# Carry on without the extension if it fails to compile (e.g. no C compiler).
+# Set after cythonize, which does not copy `optional` to the extensions it returns.
+for ext in ext_modules:
+    ext.optional = True
 
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
@@ -17,10 +40,12 @@ setup(
     author_email='christopher.gandrud@gmail.com',
     license='MIT',
     packages=['stats_batch'],
+    ext_modules=ext_modules,
     install_requires=['numpy',
                       'pandas',
                       'scipy'                   
                       ],
+    extras_require={'numba': ['numba']},
 
     classifiers=[
         'Development Status :: 3 - Alpha',
@@ -0,0 +1,53 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Compiled Chan et al merge for updating statistics with small batches. If this
+extension is not built, callers fall back to the numba or NumPy implementations.
+"""
+
+
+def chan_merge(const double[:] arr, double mean, double M2, long long n):
+    """
+    Update a running mean, sum of squared deviations (`M2`), and sample size
+    with the values in `arr` using Chan et al's pairwise update.
+
+    Parameters
+    ----------
+    arr : numpy.ndarray
+        1-D float64 array of the values in the new batch.
+    mean : float
+        Mean up until the new batch.
+    M2 : float
+        Sum of squared deviations up until the new batch.
+    n : int
+        Number of samples in the prior batches.
+
+    Returns
+    -------
+    tuple(float, float, int)
+        The updated mean, sum of squared deviations, and sample size.
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n_b = arr.shape[0]
+    cdef long long n_ab
+    cdef double s = 0.0
+    cdef double ssd_b = 0.0
+    cdef double mean_b, d, delta
+
+    if n_b == 0:
+        return mean, M2, n
+    for i in range(n_b):
+        s += arr[i]
+    mean_b = s / n_b
+    # The batch is small enough to still be in cache, so a second centred pass
+    # is cheap and avoids the cancellation of sum_sq - s * s / n_b
+    for i in range(n_b):
+        d = arr[i] - mean_b
+        ssd_b += d * d
+    if n == 0:
+        return mean_b, ssd_b, n_b
+
+    n_ab = n + n_b
+    delta = mean_b - mean
+    return (mean + delta * n_b / n_ab,
+            M2 + ssd_b + delta * delta * n * n_b / n_ab,
+            n_ab)
@@ -0,0 +1,48 @@
+"""
+Optional Numba-compiled kernels for batch updating. numba is imported and the kernels
+compiled on first use, so `import stats_batch` does not pay for it. If numba is not
+installed, the getters return `None` and callers fall back to the NumPy implementations.
+"""
+
+from functools import lru_cache
+
+
+def _welford_update(arr, mean, M2, n):
+    """
+    Update a running mean, sum of squared deviations (`M2`), and sample size
+    with every value in `arr` using Welford's algorithm.
+
+    Parameters
+    ----------
+    arr : numpy.ndarray
+        1-D float64 array of the values in the new batch.
+    mean : float
+        Mean up until the new batch.
+    M2 : float
+        Sum of squared deviations up until the new batch.
+    n : int
+        Number of samples in the prior batches.
+
+    Returns
+    -------
+    tuple(float, float, int)
+        The updated mean, sum of squared deviations, and sample size.
+    """
+    for x in arr:
+        n += 1
+        d = x - mean
+        mean += d / n
+        M2 += d * (x - mean)
+    return mean, M2, n
+
+
+@lru_cache(maxsize=None)
+def get_welford_update():
+    """
+    Returns the compiled `_welford_update`, or `None` if numba is not installed.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(_welford_update)
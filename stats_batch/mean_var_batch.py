@@ -3,9 +3,109 @@ Functions to use batch algorithms to find the mean and variance of a sample.
 """
 
 import numpy as np
-from scipy.stats import ttest_ind_from_stats
-import pandas as pd
-from math import sqrt
+from math import sqrt, fsum
+from collections.abc import Iterator, Sized
+from ._numba_kernels import get_welford_update
+
+__all__ = ["sum_square_deviations", "mean_batch", "var_batch", "MeanVarBatch", "mean_var_batch",
+           "MeanVarBatchArray", "mean_var_reduce", "ttest_ind_batched"]
+
+try:
+    from ._chan import chan_merge
+except ImportError:
+    chan_merge = None
+
+# Batches smaller than this are updated with a compiled kernel (the Cython extension if it
+# is built, otherwise numba if it is installed), where per-call NumPy overhead would otherwise dominate.
+_SMALL_BATCH = 10_000
+
+
+def _as_float_array(new_batch) -> np.ndarray:
+    """
+    Convert a batch to a float64 NumPy array so reductions run in C rather than
+    through Python-level iteration. Generators are consumed with `np.fromiter`.
+    """
+    if isinstance(new_batch, Iterator):
+        return np.fromiter(new_batch, dtype=np.float64)
+    return np.asarray(new_batch, dtype=np.float64)
+
+
+def _ssd_about_mean(arr:np.ndarray, mean:float) -> float:
+    """
+    Sum of squared deviations of `arr` from an already computed `mean`.
+    """
+    # Flatten so multi-dimensional input gives one total rather than np.inner's matrix product
+    d = (arr - mean).ravel()
+    # For 1-D arrays np.inner calls the same BLAS ddot as np.dot, with less dispatch overhead
+    return np.inner(d, d)
+
+
+def _mean_ssd(arr:np.ndarray, stable:bool=True):
+    """
+    Sample size, mean, and sum of squared deviations of a batch.
+
+    With `stable=True` the deviations are taken from the batch mean (two passes).
+    With `stable=False` a single pass finds the sum and sum of squares and uses
+    `ssd = sum_sq - sum**2 / n`, which moves less memory but is prone to
+    cancellation when the mean is large relative to the spread.
+    """
+    n = arr.size
+    s = np.add.reduce(arr)
+    mean = s / n
+    if stable:
+        ssd = _ssd_about_mean(arr, mean)
+    else:
+        # Cancellation can push the difference slightly below zero
+        ssd = max(np.dot(arr, arr) - s * s / n, 0.0)
+    return n, mean, ssd
+
+
+def _merge(a, b):
+    """
+    Merge two (sample size, mean, sum of squared deviations) tuples using Chan et al's
+    pairwise update.
+    """
+    n_a, mean_a, ssd_a = a
+    n_b, mean_b, ssd_b = b
+    if n_a == 0:
+        return b
+    if n_b == 0:
+        return a
+    n_ab = n_a + n_b
+    delta = mean_b - mean_a
+    mean_ab = mean_a + delta * n_b / n_ab
+    ssd_ab = ssd_a + ssd_b + delta * delta * n_a * n_b / n_ab
+    return n_ab, mean_ab, ssd_ab
+
+
+def _mean_var_update(new_batch, prior_mean:float=None, prior_sum_squares:float=None, prior_sample_size:int=None,
+                     stable:bool=True):
+    """
+    Mean, variance, sum of squared deviations, and sample size after updating the prior
+    statistics with `new_batch`, scanning the batch once. See `mean_var_batch`.
+    """
+    arr = _as_float_array(new_batch)
+    kernel = None
+    if arr.ndim == 1 and 0 < arr.size < _SMALL_BATCH:
+        kernel = chan_merge if chan_merge is not None else get_welford_update()
+    if kernel is not None:
+        if prior_sum_squares is None or prior_mean is None or prior_sample_size is None:
+            b_mean, b_ssd, b_n = kernel(arr, 0.0, 0.0, 0)
+            return b_mean, b_ssd / b_n, b_ssd, int(b_n)
+        b_mean, b_ssd, b_n = kernel(arr, float(prior_mean), float(prior_sum_squares),
+                                    int(prior_sample_size))
+        return b_mean, b_ssd / (b_n - 1), b_ssd, int(b_n)
+    if arr.size == 0 and not (prior_sum_squares is None or prior_mean is None or prior_sample_size is None):
+        # Nothing to add, so keep the prior statistics rather than merging in a NaN batch mean
+        var = prior_sum_squares / (prior_sample_size - 1) if prior_sample_size > 1 else np.nan
+        return prior_mean, var, prior_sum_squares, prior_sample_size
+    n_b, mean_b, ssd_b = _mean_ssd(arr, stable)
+    if prior_sum_squares is None or prior_mean is None or prior_sample_size is None:
+        return mean_b, ssd_b / n_b, ssd_b, n_b
+    total_samples, b_mean, b_ssd = _merge((prior_sample_size, prior_mean, prior_sum_squares),
+                                          (n_b, mean_b, ssd_b))
+    return b_mean, b_ssd / (total_samples - 1), b_ssd, total_samples
+
 
 def sum_square_deviations(x) -> float:
     """
@@ -14,7 +114,8 @@ def sum_square_deviations(x) -> float:
     Parameters
     ----------
     x : array_like
-        Sample to find the sum of the squared deviations of.
+        Sample to find the sum of the squared deviations of. Multi-dimensional input
+        is treated as one flattened sample.
 
     Returns
     -------
@@ -27,7 +128,8 @@ def sum_square_deviations(x) -> float:
     >>> sum_square_deviations([1, 2, 3])
     2.0
     """
-    return sum((x - np.mean(x)) ** 2)
+    arr = _as_float_array(x)
+    return float(_ssd_about_mean(arr, arr.mean()))
 
 
 def mean_batch(new_batch, prior_mean:float=None, prior_sample_size:int=None):
@@ -72,16 +174,25 @@ def mean_batch(new_batch, prior_mean:float=None, prior_sample_size:int=None):
     if prior_sample_size is None or prior_mean is None:
         return np.mean(new_batch), len(new_batch)
     else:
-        sum_new_batch = sum(new_batch)
-        total_samples = prior_sample_size + len(new_batch)
-        updated_mean = prior_mean + (1/total_samples) * (sum_new_batch - ((total_samples - prior_sample_size) * prior_mean))
+        if isinstance(new_batch, np.ndarray):
+            # Sum in float64 without first copying the batch
+            sum_new_batch = new_batch.sum(dtype=np.float64)
+            n_new_batch = new_batch.size
+        else:
+            # Exactly rounded sum of Python numbers, so rounding error does not build up
+            # across many updates
+            values = new_batch if isinstance(new_batch, Sized) else list(new_batch)
+            sum_new_batch = fsum(values)
+            n_new_batch = len(values)
+        total_samples = prior_sample_size + n_new_batch
+        updated_mean = prior_mean + (sum_new_batch - n_new_batch * prior_mean) / total_samples
         return (updated_mean, total_samples)
 
 
 def var_batch(new_batch, prior_mean:float=None, prior_sum_squares:float=None, prior_sample_size:int=None):
     """
     Find the new (approximate) variance of a sample updated by one batch.
-    If only `new_batch` is supplied, `np.var` is used.
+    If only `new_batch` is supplied, the (population) variance of the batch is returned.
 
     Parameters
     ----------
@@ -117,23 +228,24 @@ def var_batch(new_batch, prior_mean:float=None, prior_sum_squares:float=None, pr
 
     - Chan et al (1983) <http://www.cs.yale.edu/publications/techreports/tr222.pdf> 
     """
+    n_b, batch_mean, ssd_new_batch = _mean_ssd(_as_float_array(new_batch))
     if prior_sum_squares is None or prior_mean is None or prior_sample_size is None:
-        return (np.var(new_batch), sum_square_deviations(new_batch))
+        return (ssd_new_batch / n_b, ssd_new_batch)
     else:
-        batch_mean = np.mean(new_batch)
-        total_samples = prior_sample_size + len(new_batch)
-        ssd_new_batch = sum_square_deviations(new_batch)
-        new_ssd = (prior_sum_squares + ssd_new_batch) + \
-            (prior_sample_size / total_samples) * \
-            (total_samples - prior_sample_size) * \
-            (batch_mean - prior_mean) ** 2
+        total_samples, _, new_ssd = _merge((prior_sample_size, prior_mean, prior_sum_squares),
+                                           (n_b, batch_mean, ssd_new_batch))
         var_new = new_ssd / (total_samples - 1)
         return (var_new, new_ssd)
 
+
 class MeanVarBatch:
     """
     Class for mean and variance of a sample created through batch updating.
     """
+    __slots__ = ("mean", "var", "sum_squares", "sample_size")
+
+    columns = ("mean", "var", "sum_squared_dev", "sample_size")
+
     def __init__(self, mean, var, sum_squares, sample_size):
         self.mean = mean
         self.var = var
@@ -158,13 +270,78 @@ class MeanVarBatch:
            mean   var  sum_squared_dev  sample_size
         0   2.5  1.25              5.0            4
         """
-        return pd.DataFrame({"mean": [self.mean], "var": [self.var], 
-        "sum_squared_dev": [self.sum_squares], "sample_size": [self.sample_size]})
+        return self.records_to_pandas([self.as_record()])
+
+    def as_record(self):
+        """
+        Returns the mean, variance, sum of squared deviations and sample size as a tuple.
+
+        This is cheaper than `to_pandas` when recording statistics after every batch.
+        Collect the records in a list and convert them once with `records_to_pandas`.
+
+        Returns
+        -------
+        tuple(float, float, float, int)
+
+        Examples
+        --------
+        >>> sb.mean_var_batch([1,2,3,4]).as_record()
+        (2.5, 1.25, 5.0, 4)
+        """
+        return (self.mean, self.var, self.sum_squares, self.sample_size)
+
+    @classmethod
+    def records_to_pandas(cls, records):
+        """
+        Returns a pandas dataframe with one row per record.
+
+        Parameters
+        ----------
+        records : List[tuple]
+            Records created by `as_record` (or dictionaries created by `to_dict`).
+
+        Returns
+        -------
+        pandas.DataFrame
+
+        Examples
+        --------
+        >>> current = sb.mean_var_batch([1,2,3,4])
+        >>> records = [current.as_record()]
+        >>> current.update([5,6,7,8])
+        >>> records.append(current.as_record())
+        >>> sb.MeanVarBatch.records_to_pandas(records)
+           mean   var  sum_squared_dev  sample_size
+        0   2.5  1.25              5.0            4
+        1   4.5  6.00             42.0            8
+        """
+        import pandas as pd
+        return pd.DataFrame(records, columns=list(cls.columns))
+
+    def to_dict(self):
+        """
+        Returns a dictionary with the mean, variance, sum of squared deviations
+        and sample size.
+
+        When recording statistics after every batch, append these dictionaries to a
+        list and build a single data frame at the end with `pandas.DataFrame(records)`.
+        This avoids copying a growing data frame on every batch.
+
+        Returns
+        -------
+        dict
+
+        Examples
+        --------
+        >>> sb.mean_var_batch([1,2,3,4]).to_dict()
+        {'mean': 2.5, 'var': 1.25, 'sum_squared_dev': 5.0, 'sample_size': 4}
+        """
+        return dict(zip(self.columns, self.as_record()))
 
     def print(self):
         return self.to_pandas()
 
-    def update(self, new_batch):
+    def update(self, new_batch, stable:bool=True):
         """
         Updates the existing object with a new batch.
 
@@ -172,9 +349,11 @@ class MeanVarBatch:
         ----------
         new_batch: List[Union[int, float]]
             List of all values in the new batch
+        stable: bool
+            See `mean_var_batch`.
         """
-        updated = mean_var_batch(new_batch, self.mean, self.sum_squares, self.sample_size)
-        self.__dict__.update(updated.__dict__)
+        self.mean, self.var, self.sum_squares, self.sample_size = \
+            _mean_var_update(new_batch, self.mean, self.sum_squares, self.sample_size, stable)
 
     def ttest_ind(self, other):
         """
@@ -190,6 +369,7 @@ class MeanVarBatch:
         (float, float)
             The t-statistic and P-value.
         """
+        from scipy.stats import ttest_ind_from_stats
         return ttest_ind_from_stats(mean1=self.mean, mean2=other.mean,
                                    std1=sqrt(self.var), std2=sqrt(other.var),
                                    nobs1=self.sample_size, nobs2=other.sample_size)    
@@ -209,7 +389,8 @@ class MeanVarBatch:
         """
         self.to_pandas().to_csv(filename)
 
-def mean_var_batch(new_batch, prior_mean:float=None, prior_sum_squares:float=None, prior_sample_size:int=None):
+def mean_var_batch(new_batch, prior_mean:float=None, prior_sum_squares:float=None, prior_sample_size:int=None,
+                   stable:bool=True):
     """
     Find the new (approximate) mean and variance of a sample updated by one batch.
     If only `new_batch` is supplied, `np.mean` and `np.var` are used.
@@ -224,6 +405,13 @@ def mean_var_batch(new_batch, prior_mean:float=None, prior_sum_squares:float=Non
             Sum of the squares of the prior batch.
         prior_sample_size: int
             Number of samples in the prior batches.
+        stable: bool
+            If `True` (default), the batch's sum of squared deviations is found from
+            deviations around the batch mean. If `False`, it is found in a single pass
+            from the sum and sum of squares, which is faster for large batches but less
+            numerically stable. Batches of fewer than 10,000 values that are updated
+            with a compiled kernel (see Notes) ignore `stable`, as the kernels are always
+            numerically stable.
     
     Returns
     -------
@@ -233,14 +421,251 @@ def mean_var_batch(new_batch, prior_mean:float=None, prior_sum_squares:float=Non
         3. The sum of square deviations of the new batch and prior batches.
         4. The sample size of the new batch and prior batches.
 
+    Notes
+    -----
+    Batches of fewer than 10,000 values are updated with a compiled kernel, which avoids
+    NumPy's per-call overhead when streaming many small batches. The Cython extension is used
+    if it was built when installing, otherwise a Welford kernel is used if numba is installed.
+
     Examples
     --------
     >>> from stats_batch import mean_var_batch
     >>> mean_var_batch([1,2,3,4])
     >>> mean_var_batch([1,2,3,4], prior_mean = 2.5, prior_sum_squares = 5, prior_sample_size = 4)
     """
-    b_mean, b_n = mean_batch(new_batch, prior_mean, prior_sample_size)
-    b_var, b_ssd = var_batch(new_batch, prior_mean, prior_sum_squares, prior_sample_size)
-    return  MeanVarBatch(b_mean, b_var, b_ssd, b_n)
+    return MeanVarBatch(*_mean_var_update(new_batch, prior_mean, prior_sum_squares, prior_sample_size, stable))
+
+
+class MeanVarBatchArray:
+    """
+    Means and variances of many samples (e.g. groups) created through batch updating.
 
-        
\ No newline at end of file
+    The statistics are stored as parallel NumPy arrays rather than a list of
+    `MeanVarBatch` objects, so they can be passed to vectorised functions such as
+    `ttest_ind_batched` without copying. Indexing returns a `MeanVarBatch` copy of one
+    sample, so update samples with `update(i, new_batch)` rather than `groups[i].update`.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of samples to allocate space for. Storage grows as needed.
+
+    Examples
+    --------
+    >>> groups = sb.MeanVarBatchArray()
+    >>> a = groups.append([1,2,3,4])
+    >>> b = groups.append([2,3,4,5])
+    >>> groups.update(a, [5,6,7,8])
+    >>> groups.to_pandas()
+       mean   var  sum_squared_dev  sample_size
+    0   4.5  6.00             42.0            8
+    1   3.5  1.25              5.0            4
+    """
+    def __init__(self, capacity:int=16):
+        self.mean = np.zeros(capacity)
+        self.var = np.zeros(capacity)
+        self.sum_squares = np.zeros(capacity)
+        self.sample_size = np.zeros(capacity, dtype=np.int64)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def _index(self, i:int) -> int:
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("MeanVarBatchArray index out of range")
+        return i
+
+    def __getitem__(self, i):
+        """
+        Returns a copy of sample `i` as a `MeanVarBatch`. Updating the copy does not
+        change the array; use `update(i, new_batch)` instead.
+        """
+        i = self._index(i)
+        return MeanVarBatch(float(self.mean[i]), float(self.var[i]),
+                            float(self.sum_squares[i]), int(self.sample_size[i]))
+
+    def _grow(self):
+        capacity = max(2 * self.mean.size, 1)
+        for field in ("mean", "var", "sum_squares", "sample_size"):
+            old = getattr(self, field)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, field, new)
+
+    def append(self, new_batch=None) -> int:
+        """
+        Adds a new sample, optionally starting it with a first batch.
+
+        Parameters
+        ----------
+        new_batch: List[Union[int, float]]
+            List of all values in the first batch of the sample.
+
+        Returns
+        -------
+        int
+            The index of the new sample.
+        """
+        if self.n == self.mean.size:
+            self._grow()
+        i = self.n
+        self.n += 1
+        if new_batch is not None:
+            self.update(i, new_batch)
+        return i
+
+    def update(self, i:int, new_batch):
+        """
+        Updates sample `i` with a new batch.
+
+        Parameters
+        ----------
+        i : int
+            Index of the sample to update. Negative indices count from the last sample.
+        new_batch: List[Union[int, float]]
+            List of all values in the new batch
+        """
+        i = self._index(i)
+        if self.sample_size[i] == 0:
+            updated = _mean_var_update(new_batch)
+        else:
+            updated = _mean_var_update(new_batch, float(self.mean[i]), float(self.sum_squares[i]),
+                                       int(self.sample_size[i]))
+        self.mean[i], self.var[i], self.sum_squares[i], self.sample_size[i] = updated
+
+    def to_pandas(self):
+        """
+        Returns a pandas dataframe with one row per sample with the mean, variance,
+        sum of squared deviations and sample size.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        import pandas as pd
+        columns = (self.mean, self.var, self.sum_squares, self.sample_size)
+        return pd.DataFrame({name: values[:self.n] for name, values in zip(MeanVarBatch.columns, columns)})
+
+
+def _leaf(batch):
+    """
+    Sample size, mean, and sum of squared deviations of a single batch.
+    """
+    arr = _as_float_array(batch)
+    if arr.size == 0:
+        return 0, 0.0, 0.0
+    return _mean_ssd(arr)
+
+
+def mean_var_reduce(batches, workers:int=1, chunksize:int=None):
+    """
+    Find the mean and variance of a sample from an iterable of batches by summarising
+    each batch, optionally in parallel, and then merging the summaries pairwise.
+
+    Because the merge is associative, the batches are combined in a balanced binary
+    tree rather than folded one at a time. This keeps the number of merges each value
+    passes through to log2 of the number of batches, which limits rounding error.
+
+    Parameters
+    ----------
+        batches: Iterable[List[Union[int, float]]]
+            Iterable of batches, e.g. from `group_elements`.
+        workers: int
+            Number of worker processes. If `1` (default), the batches are summarised in
+            the current process. If `None`, the `ProcessPoolExecutor` default is used.
+            Every batch is copied to a worker, so a pool only pays off when summarising
+            a batch costs more than sending it, e.g. for large batches.
+        chunksize: int
+            Number of batches sent to a worker at a time. If `None`, the batches are
+            split into about four chunks per worker.
+
+    Returns
+    -------
+        MeanVarBatch
+        The variance follows `mean_var_batch`: it is the population variance if there
+        is a single batch and the sample variance otherwise.
+
+    Examples
+    --------
+    >>> import stats_batch as sb
+    >>> sb.mean_var_reduce(sb.group_elements(range(1, 9), 4)).to_pandas()
+       mean  var  sum_squared_dev  sample_size
+    0   4.5  6.0             42.0            8
+    """
+    if workers == 1:
+        summaries = [_leaf(batch) for batch in batches]
+    else:
+        import os
+        from concurrent.futures import ProcessPoolExecutor
+        batches = list(batches)
+        if chunksize is None:
+            n_workers = workers if workers is not None else (os.cpu_count() or 1)
+            chunksize = max(1, len(batches) // (4 * n_workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            summaries = list(executor.map(_leaf, batches, chunksize=chunksize))
+    # Empty batches add nothing and do not count as batches for the variance below
+    summaries = [summary for summary in summaries if summary[0] > 0]
+    n_batches = len(summaries)
+    if n_batches == 0:
+        raise ValueError("`batches` must contain at least one value.")
+
+    while len(summaries) > 1:
+        merged = [_merge(summaries[i], summaries[i + 1]) for i in range(0, len(summaries) - 1, 2)]
+        if len(summaries) % 2:
+            merged.append(summaries[-1])
+        summaries = merged
+
+    n, mean, ssd = summaries[0]
+    var = ssd / n if n_batches == 1 else ssd / (n - 1)
+    return MeanVarBatch(mean, var, ssd, n)
+
+
+def _mean_std_nobs(batches):
+    """
+    Arrays of the means, standard deviations, and sample sizes of a list of `MeanVarBatch`
+    or a `MeanVarBatchArray`.
+    """
+    if isinstance(batches, MeanVarBatchArray):
+        n = len(batches)
+        return batches.mean[:n], np.sqrt(batches.var[:n]), batches.sample_size[:n]
+    n = len(batches)
+    means = np.fromiter((m.mean for m in batches), dtype=np.float64, count=n)
+    stds = np.sqrt(np.fromiter((m.var for m in batches), dtype=np.float64, count=n))
+    nobs = np.fromiter((m.sample_size for m in batches), dtype=np.float64, count=n)
+    return means, stds, nobs
+
+
+def ttest_ind_batched(list_a, list_b):
+    """
+    T-tests for the means of many pairs of independent samples in one vectorised call.
+
+    Parameters
+    ----------
+    list_a : Union[List[MeanVarBatch], MeanVarBatchArray]
+        Sufficient statistics of the first sample in each pair.
+    list_b : Union[List[MeanVarBatch], MeanVarBatchArray]
+        Sufficient statistics of the second sample in each pair. Must be the same
+        length as `list_a`.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        The t-statistics and P-values, one per pair.
+
+    Examples
+    --------
+    >>> a = [sb.mean_var_batch([1,2,3,4]), sb.mean_var_batch([1,2,3,4])]
+    >>> b = [sb.mean_var_batch([2,3,4,5]), sb.mean_var_batch([5,6,7,8])]
+    >>> sb.ttest_ind_batched(a, b)
+    """
+    from scipy.stats import ttest_ind_from_stats
+    if len(list_a) != len(list_b):
+        raise ValueError("`list_a` and `list_b` must be the same length.")
+    mean1, std1, nobs1 = _mean_std_nobs(list_a)
+    mean2, std2, nobs2 = _mean_std_nobs(list_b)
+    return ttest_ind_from_stats(mean1=mean1, mean2=mean2,
+                                std1=std1, std2=std2,
+                                nobs1=nobs1, nobs2=nobs2)
@@ -3,6 +3,9 @@ Utilities for testing and illustrating stats-batch
 """
 
 from itertools import islice
+import numpy as np
+
+__all__ = ["group_elements"]
 
 def group_elements(lst:list, batch_size:int) -> list:
     """
@@ -12,9 +15,14 @@ def group_elements(lst:list, batch_size:int) -> list:
     Parameters
     ----------
     lst : list
-        The list to be grouped into batches
+        The list to be grouped into batches. If `lst` is a NumPy array, the batches
+        are array views rather than tuples, so no data is copied.
     chunk_size : int
         The size of the batches
     """
+    if isinstance(lst, np.ndarray):
+        for i in range(0, len(lst), batch_size):
+            yield lst[i:i + batch_size]
+        return
     lst = iter(lst)
-    return iter(lambda: tuple(islice(lst, batch_size)), ())
\ No newline at end of file
+    yield from iter(lambda: tuple(islice(lst, batch_size)), ())
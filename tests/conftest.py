@@ -0,0 +1,24 @@
+import importlib
+import pytest
+
+# The `stats_batch.mean_var_batch` attribute is the function, so import the module by name
+mvb = importlib.import_module("stats_batch.mean_var_batch")
+
+
+@pytest.fixture
+def numpy_only(monkeypatch):
+    """
+    Disable the compiled small-batch kernels so the NumPy path is used.
+    """
+    monkeypatch.setattr(mvb, "chan_merge", None)
+    monkeypatch.setattr(mvb, "get_welford_update", lambda: None)
+
+
+@pytest.fixture
+def numba_only(monkeypatch):
+    """
+    Disable the Cython kernel so small batches use the numba kernel.
+    """
+    if mvb.get_welford_update() is None:
+        pytest.skip("numba is not installed")
+    monkeypatch.setattr(mvb, "chan_merge", None)
@@ -22,3 +22,17 @@ def test_mean_batch_multiple_batches():
     b2_mean, b2_n = sb.mean_batch(batch_2, b1_mean, b1_n)
     npt.assert_approx_equal(b2_mean, np.mean(x))
     assert b2_n == n
+
+# Test mean_batch accepts generators when updating
+def test_mean_batch_generator():
+    x = list(range(1, 100))
+    b1_mean, b1_n = sb.mean_batch(x[:10])
+    b2_mean, b2_n = sb.mean_batch((i for i in x[10:]), b1_mean, b1_n)
+    npt.assert_approx_equal(b2_mean, np.mean(x))
+    assert b2_n == len(x)
+
+# Test mean_batch sums Python lists without cancellation error
+def test_mean_batch_list_exact_sum():
+    b_mean, b_n = sb.mean_batch([1e16, 1.0, -1e16, 1.0], 0.0, 4)
+    assert b_mean == 0.25
+    assert b_n == 8
@@ -1,6 +1,7 @@
 from math import sqrt
 import stats_batch as sb
 import numpy as np
+import pytest
 from pytest import approx
 from scipy.stats import ttest_ind_from_stats
 from scipy.stats import ttest_ind
@@ -37,6 +38,53 @@ def test_batch_mean_var_t_test():
     assert batch_t[0] == approx(list_t[0])
     assert batch_t[1] == approx(list_t[1])
 
+def test_mean_var_batch_matches_separate_updates(numpy_only):
+    x = np.random.normal(size=1_000)
+    b1_mean, b1_n = sb.mean_batch(x[:100])
+    b1_var, b1_ssd = sb.var_batch(x[:100])
+    b2_mean, b2_n = sb.mean_batch(x[100:], b1_mean, b1_n)
+    b2_var, b2_ssd = sb.var_batch(x[100:], b1_mean, b1_ssd, b1_n)
 
- 
+    for stable in (True, False):
+        current = sb.mean_var_batch(x[:100], stable=stable)
+        assert current.var == approx(b1_var)
+        current = sb.mean_var_batch(x[100:], current.mean, current.sum_squares,
+                                    current.sample_size, stable=stable)
+        assert current.mean == approx(b2_mean)
+        assert current.var == approx(b2_var)
+        assert current.sum_squares == approx(b2_ssd)
+        assert current.sample_size == b2_n
 
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_mean_var_batch_empty_batch():
+    current = sb.mean_var_batch([])
+    assert np.isnan(current.mean)
+    assert current.sample_size == 0
+
+def test_mean_var_batch_update_empty_batch():
+    current = sb.mean_var_batch([1,2,3,4])
+    current.update([])
+    assert current.mean == 2.5
+    assert current.sum_squares == 5.0
+    assert current.sample_size == 4
+    assert current.var == approx(5 / 3)
+
+def test_mean_var_batch_single_pass_large_batches():
+    n = 100_000
+    x = np.random.normal(size=n, loc=5)
+
+    current = sb.mean_var_batch(x[:50_000], stable=False)
+    current.update(x[50_000:], stable=False)
+    assert current.mean == approx(np.mean(x))
+    assert current.var == approx(np.var(x, ddof=1))
+    assert current.sample_size == n
+
+def test_ttest_ind_batched():
+    a = [sb.mean_var_batch(np.random.normal(size=100)) for _ in range(5)]
+    b = [sb.mean_var_batch(np.random.normal(size=200, loc=0.1)) for _ in range(5)]
+
+    batched_t = sb.ttest_ind_batched(a, b)
+    for i in range(5):
+        pair_t = a[i].ttest_ind(b[i])
+        assert batched_t[0][i] == approx(pair_t[0])
+        assert batched_t[1][i] == approx(pair_t[1])
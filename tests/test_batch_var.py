@@ -24,3 +24,9 @@ def test_var_batch_multiple_batches():
     b2_var, b2_ssd = sb.var_batch(batch_2, b1_mean, b1_ssd, b1_n)
     npt.assert_approx_equal(b2_var, np.var(x), significant=4)
     npt.assert_approx_equal(b2_ssd, sb.sum_square_deviations(x))
+
+# Test that sum_square_deviations treats 2-D input as one flattened sample
+def test_sum_square_deviations_2d():
+    x = np.random.normal(size=(10, 3))
+    npt.assert_approx_equal(sb.sum_square_deviations(x), np.var(x) * x.size)
+    npt.assert_approx_equal(sb.sum_square_deviations(x), sb.sum_square_deviations(x.ravel()))
@@ -0,0 +1,59 @@
+import importlib
+import stats_batch as sb
+import numpy as np
+import pytest
+from pytest import approx
+
+mvb = importlib.import_module("stats_batch.mean_var_batch")
+
+# Test the numba Welford kernel against the NumPy batch summary
+def test_welford_update_matches_numpy():
+    welford_update = importlib.import_module("stats_batch._numba_kernels").get_welford_update()
+    if welford_update is None:
+        pytest.skip("numba is not installed")
+    x = np.random.normal(size=1_000, loc=3)
+
+    b_mean, b_ssd, b_n = welford_update(x[:100], 0.0, 0.0, 0)
+    n, mean, ssd = mvb._mean_ssd(x[:100])
+    assert (b_mean, b_ssd, b_n) == (approx(mean), approx(ssd), n)
+
+    b_mean, b_ssd, b_n = welford_update(x[100:], b_mean, b_ssd, b_n)
+    n, mean, ssd = mvb._mean_ssd(x)
+    assert (b_mean, b_ssd, b_n) == (approx(mean), approx(ssd), n)
+
+# Test the Cython Chan kernel against the NumPy batch summary and merge
+def test_chan_merge_matches_numpy():
+    chan_merge = pytest.importorskip("stats_batch._chan").chan_merge
+    x = np.random.normal(size=1_000, loc=3)
+
+    b_mean, b_ssd, b_n = chan_merge(x[:100], 0.0, 0.0, 0)
+    n, mean, ssd = mvb._mean_ssd(x[:100])
+    assert (b_mean, b_ssd, b_n) == (approx(mean), approx(ssd), n)
+
+    b_mean, b_ssd, b_n = chan_merge(x[100:], b_mean, b_ssd, b_n)
+    n, mean, ssd = mvb._merge((n, mean, ssd), mvb._mean_ssd(x[100:]))
+    assert (b_mean, b_ssd, b_n) == (approx(mean), approx(ssd), n)
+
+    # Strided input and an empty batch
+    assert chan_merge(x[::2], 0.0, 0.0, 0)[0] == approx(np.mean(x[::2]))
+    assert chan_merge(x[:0], b_mean, b_ssd, b_n) == (b_mean, b_ssd, b_n)
+
+def _check_small_batch_updates():
+    x = np.random.normal(size=1_000)
+    current = sb.mean_var_batch(x[:100])
+    assert current.var == approx(np.var(x[:100]))
+    current.update(x[100:])
+    assert current.mean == approx(np.mean(x))
+    assert current.var == approx(np.var(x, ddof=1))
+    assert current.sum_squares == approx(sb.sum_square_deviations(x))
+    assert current.sample_size == 1_000
+
+# Test that every small-batch path through mean_var_batch gives the same statistics
+def test_mean_var_batch_default_path():
+    _check_small_batch_updates()
+
+def test_mean_var_batch_numba_path(numba_only):
+    _check_small_batch_updates()
+
+def test_mean_var_batch_numpy_path(numpy_only):
+    _check_small_batch_updates()
@@ -0,0 +1,61 @@
+import stats_batch as sb
+import numpy as np
+import pytest
+from pytest import approx
+
+def _groups_and_individual(x):
+    groups = sb.MeanVarBatchArray(capacity=4)
+    individual = []
+    for row in x:
+        groups.append(row[:100])
+        individual.append(sb.mean_var_batch(row[:100]))
+    for i, row in enumerate(x):
+        groups.update(i, row[100:])
+        individual[i].update(row[100:])
+    return groups, individual
+
+# Test MeanVarBatchArray grows past its capacity and matches MeanVarBatch
+def test_mean_var_batch_array_growth():
+    x = np.random.normal(size=(20, 1_000))
+    groups, individual = _groups_and_individual(x)
+
+    assert len(groups) == 20
+    assert groups.mean.size >= 20
+    for i in range(20):
+        assert groups[i].mean == approx(individual[i].mean)
+        assert groups[i].var == approx(individual[i].var)
+        assert groups[i].sample_size == 1_000
+    assert len(groups.to_pandas()) == 20
+
+# Test negative indices count from the last sample
+def test_mean_var_batch_array_negative_index():
+    x = np.random.normal(size=(3, 1_000))
+    groups, individual = _groups_and_individual(x)
+
+    assert groups[-3].mean == approx(individual[0].mean)
+    groups.update(-1, x[-1])
+    individual[-1].update(x[-1])
+    assert groups[-1].mean == approx(individual[-1].mean)
+    assert groups[-1].sample_size == 2_000
+
+# Test out of range indices raise IndexError
+def test_mean_var_batch_array_index_error():
+    groups = sb.MeanVarBatchArray()
+    groups.append([1,2,3,4])
+    with pytest.raises(IndexError):
+        groups[1]
+    with pytest.raises(IndexError):
+        groups[-2]
+    with pytest.raises(IndexError):
+        groups.update(1, [1,2,3,4])
+
+# Test ttest_ind_batched accepts a MeanVarBatchArray
+def test_mean_var_batch_array_ttest_ind_batched():
+    x = np.random.normal(size=(5, 1_000))
+    groups, individual = _groups_and_individual(x)
+
+    batched_t = sb.ttest_ind_batched(groups, individual[::-1])
+    for i in range(5):
+        pair_t = individual[i].ttest_ind(individual[-1 - i])
+        assert batched_t[0][i] == approx(pair_t[0])
+        assert batched_t[1][i] == approx(pair_t[1])
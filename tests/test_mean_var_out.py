@@ -19,14 +19,47 @@ def test_batch_updating_to_pandas():
     batch_size = 1_000
     a = np.random.normal(size=n, loc=0.1)
 
+    records = []
     for i, new_list in enumerate(sb.group_elements(a , batch_size)):
         if i == 0:
             mean_var_a = sb.mean_var_batch(new_list)
-            suf_stats_df = mean_var_a.to_pandas()
         else:
             mean_var_a.update(new_list)
-            suf_stats_df = suf_stats_df.append(mean_var_a.to_pandas())
+        records.append(mean_var_a.to_dict())
+    suf_stats_df = pd.DataFrame(records)
 
     assert isinstance(suf_stats_df, pd.DataFrame)
     assert len(suf_stats_df) == n/batch_size
+    assert suf_stats_df["sample_size"].iloc[-1] == n
 
+
+def test_records_to_pandas():
+    """
+    Test that per-batch records convert to one pandas data frame
+    """
+    a = np.random.normal(size=1_000)
+    records = []
+    for i, new_list in enumerate(sb.group_elements(a, 100)):
+        if i == 0:
+            mean_var_a = sb.mean_var_batch(new_list)
+        else:
+            mean_var_a.update(new_list)
+        records.append(mean_var_a.as_record())
+    suf_stats_df = sb.MeanVarBatch.records_to_pandas(records)
+
+    assert list(suf_stats_df.columns) == list(mean_var_a.to_pandas().columns)
+    assert len(suf_stats_df) == 10
+    assert suf_stats_df["sample_size"].iloc[-1] == 1_000
+
+def test_group_elements():
+    """
+    Test that group_elements gives the same batches for lists and arrays
+    """
+    a = np.arange(25)
+    list_batches = list(sb.group_elements(list(a), 10))
+    array_batches = list(sb.group_elements(a, 10))
+
+    assert [len(batch) for batch in array_batches] == [10, 10, 5]
+    assert all(isinstance(batch, np.ndarray) for batch in array_batches)
+    assert all(np.shares_memory(batch, a) for batch in array_batches)
+    assert [tuple(batch) for batch in array_batches] == list_batches
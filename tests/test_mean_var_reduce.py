@@ -0,0 +1,30 @@
+import stats_batch as sb
+import numpy as np
+import pytest
+from pytest import approx
+
+# Test mean_var_reduce matches sequential updating, in and out of process
+def test_mean_var_reduce():
+    n = 10_000
+    x = np.random.normal(size=n)
+
+    current = sb.mean_var_batch(x[:1_000])
+    for batch in sb.group_elements(x[1_000:], 1_000):
+        current.update(batch)
+
+    for workers in (1, 2):
+        reduced = sb.mean_var_reduce(sb.group_elements(x, 1_000), workers=workers, chunksize=5)
+        assert reduced.mean == approx(current.mean)
+        assert reduced.var == approx(current.var)
+        assert reduced.sum_squares == approx(current.sum_squares)
+        assert reduced.sample_size == n
+
+# Test mean_var_reduce skips empty batches and raises if there are no values
+def test_mean_var_reduce_empty_batches():
+    for batches in ([], [[]], [[], []]):
+        with pytest.raises(ValueError):
+            sb.mean_var_reduce(batches)
+    reduced = sb.mean_var_reduce([[], [1,2,3,4], []])
+    assert reduced.mean == 2.5
+    assert reduced.var == 1.25
+    assert reduced.sample_size == 4